@@ -354,13 +354,40 @@ class AutoencoderOobleck(ModelMixin, ConfigMixin):
         )
 
         self.use_slicing = False
+        self.slice_size = 1
+        self.use_tiling = False
+        self.tile_size = 128
 
-    def enable_slicing(self):
+    @property
+    def decoder_receptive_field(self) -> int:
+        r"""
+        The number of latent frames on each side of a latent frame that the decoded waveform depends on, i.e. the
+        receptive field of the decoder expressed in latent frames. It is computed from the convolutions of the decoder,
+        which are registered in the order they are applied.
+        """
+        receptive_field = 0.0
+        upsampling_factor = 1
+        for module in self.decoder.modules():
+            if isinstance(module, nn.ConvTranspose1d):
+                # an output sample depends on `kernel_size / stride` input samples on each side
+                receptive_field += math.ceil(module.kernel_size[0] / module.stride[0]) / upsampling_factor
+                upsampling_factor *= module.stride[0]
+            elif isinstance(module, nn.Conv1d):
+                half_kernel = module.dilation[0] * (module.kernel_size[0] - 1) / 2
+                receptive_field += math.ceil(half_kernel / module.stride[0]) / upsampling_factor
+        return math.ceil(receptive_field)
+
+    def enable_slicing(self, slice_size: int = 1):
         r"""
         Enable sliced VAE decoding. When this option is enabled, the VAE will split the input tensor in slices to
         compute decoding in several steps. This is useful to save some memory and allow larger batch sizes.
+
+        Args:
+            slice_size (`int`, *optional*, defaults to `1`):
+                The number of samples in each slice. Larger slices are faster to compute but use more memory.
         """
         self.use_slicing = True
+        self.slice_size = slice_size
 
     def disable_slicing(self):
         r"""
@@ -369,6 +396,27 @@ class AutoencoderOobleck(ModelMixin, ConfigMixin):
         """
         self.use_slicing = False
 
+    def enable_tiling(self, tile_size: int = 128):
+        r"""
+        Enable tiled VAE decoding. When this option is enabled, the VAE will split the latents into tiles along the
+        time axis and decode them separately, each with the receptive field of the decoder as context on both sides.
+        The decoded waveform is the same as without tiling, but the peak memory of the decoder only depends on the tile
+        size, which allows to decode longer audio samples.
+
+        Args:
+            tile_size (`int`, *optional*, defaults to `128`):
+                The number of latent frames in each tile. Larger tiles are faster to decode but use more memory.
+        """
+        self.use_tiling = True
+        self.tile_size = tile_size
+
+    def disable_tiling(self):
+        r"""
+        Disable tiled VAE decoding. If `enable_tiling` was previously enabled, this method will go back to computing
+        decoding in one step.
+        """
+        self.use_tiling = False
+
     @apply_forward_hook
     def encode(
         self, x: torch.Tensor, return_dict: bool = True
@@ -385,8 +433,8 @@ class AutoencoderOobleck(ModelMixin, ConfigMixin):
                 The latent representations of the encoded images. If `return_dict` is True, a
                 [`~models.autoencoder_kl.AutoencoderKLOutput`] is returned, otherwise a plain `tuple` is returned.
         """
-        if self.use_slicing and x.shape[0] > 1:
-            encoded_slices = [self.encoder(x_slice) for x_slice in x.split(1)]
+        if self.use_slicing and x.shape[0] > self.slice_size:
+            encoded_slices = [self.encoder(x_slice) for x_slice in x.split(self.slice_size)]
             h = torch.cat(encoded_slices)
         else:
             h = self.encoder(x)
@@ -399,6 +447,9 @@ class AutoencoderOobleck(ModelMixin, ConfigMixin):
         return AutoencoderOobleckOutput(latent_dist=posterior)
 
     def _decode(self, z: torch.Tensor, return_dict: bool = True) -> Union[OobleckDecoderOutput, torch.Tensor]:
+        if self.use_tiling and z.shape[-1] > self.tile_size:
+            return self.tiled_decode(z, return_dict=return_dict)
+
         dec = self.decoder(z)
 
         if not return_dict:
@@ -406,6 +457,46 @@ class AutoencoderOobleck(ModelMixin, ConfigMixin):
 
         return OobleckDecoderOutput(sample=dec)
 
+    def tiled_decode(self, z: torch.Tensor, return_dict: bool = True) -> Union[OobleckDecoderOutput, torch.Tensor]:
+        r"""
+        Decode a batch of latents using a tiled decoder.
+
+        Args:
+            z (`torch.Tensor`): Input batch of latent vectors.
+            return_dict (`bool`, *optional*, defaults to `True`):
+                Whether or not to return a [`~models.vae.OobleckDecoderOutput`] instead of a plain tuple.
+
+        Returns:
+            [`~models.vae.OobleckDecoderOutput`] or `tuple`:
+                If return_dict is True, a [`~models.vae.OobleckDecoderOutput`] is returned, otherwise a plain `tuple`
+                is returned.
+        """
+        receptive_field = self.decoder_receptive_field
+        num_latents = z.shape[-1]
+
+        # Each tile is decoded with the latents its waveform depends on, so that the tiles don't need to be blended.
+        # The decoder returns fewer than `hop_length` samples per latent frame when some of its upsampling ratios are
+        # odd, so the waveform of the last tile is kept up to the end of the decoded samples.
+        tiles = []
+        for tile_start in range(0, num_latents, self.tile_size):
+            tile_end = min(tile_start + self.tile_size, num_latents)
+            latent_start = max(tile_start - receptive_field, 0)
+            latent_end = min(tile_end + receptive_field, num_latents)
+            decoded = self.decoder(z[:, :, latent_start:latent_end])
+
+            waveform_start = (tile_start - latent_start) * self.hop_length
+            if tile_end == num_latents:
+                tiles.append(decoded[:, :, waveform_start:])
+            else:
+                waveform_end = (tile_end - latent_start) * self.hop_length
+                tiles.append(decoded[:, :, waveform_start:waveform_end])
+        dec = torch.cat(tiles, dim=-1)
+
+        if not return_dict:
+            return (dec,)
+
+        return OobleckDecoderOutput(sample=dec)
+
     @apply_forward_hook
     def decode(
         self, z: torch.FloatTensor, return_dict: bool = True, generator=None
@@ -424,8 +515,8 @@ class AutoencoderOobleck(ModelMixin, ConfigMixin):
                 is returned.
 
         """
-        if self.use_slicing and z.shape[0] > 1:
-            decoded_slices = [self._decode(z_slice).sample for z_slice in z.split(1)]
+        if self.use_slicing and z.shape[0] > self.slice_size:
+            decoded_slices = [self._decode(z_slice).sample for z_slice in z.split(self.slice_size)]
             decoded = torch.cat(decoded_slices)
         else:
             decoded = self._decode(z).sample
@@ -16,6 +16,7 @@
 import fnmatch
 import importlib
 import inspect
+import itertools
 import os
 import re
 import sys
@@ -87,6 +88,59 @@ from .pipeline_loading_utils import (
 if is_accelerate_available():
     import accelerate
 
+    class _StreamPrefetchCpuOffload(accelerate.hooks.CpuOffload):
+        """
+        [`~accelerate.hooks.CpuOffload`] hook used by `enable_model_cpu_offload(prefetch_next_model=True)`. Once the
+        forward of its model has been enqueued, it copies the next model of the offload sequence to the execution
+        device on a side CUDA stream, so that the host-to-device transfer of the next model overlaps with the compute
+        of the current one instead of being serialized with it.
+        """
+
+        def __init__(self, execution_device, prev_module_hook=None, copy_stream=None):
+            super().__init__(execution_device=execution_device, prev_module_hook=prev_module_hook)
+            self.copy_stream = copy_stream
+            # `UserCpuOffloadHook` of the next model in the offload sequence, set once it has been created
+            self.next_module_hook = None
+            self.prefetch_event = None
+
+        def init_hook(self, module):
+            # the module can be offloaded while it is still being prefetched, e.g. when another model of the pipeline
+            # runs out of `model_cpu_offload_seq` order, its weights must not be read before the copy is done
+            self.wait_for_prefetch(module)
+            return super().init_hook(module)
+
+        def wait_for_prefetch(self, module):
+            if self.prefetch_event is None:
+                return
+
+            compute_stream = torch.cuda.current_stream(self.execution_device)
+            compute_stream.wait_event(self.prefetch_event)
+            # the prefetched weights were allocated on the copy stream but are used on the compute stream, the
+            # caching allocator must not reuse their memory before the compute stream is done with them
+            for tensor in itertools.chain(module.parameters(), module.buffers()):
+                tensor.data.record_stream(compute_stream)
+            self.prefetch_event = None
+
+        def prefetch(self, module):
+            first_parameter = next(module.parameters(), None)
+            if first_parameter is None or first_parameter.device == torch.device(self.execution_device):
+                return
+
+            with torch.cuda.stream(self.copy_stream):
+                module.to(self.execution_device, non_blocking=True)
+            self.prefetch_event = torch.cuda.Event()
+            self.prefetch_event.record(self.copy_stream)
+
+        def pre_forward(self, module, *args, **kwargs):
+            self.wait_for_prefetch(module)
+            return super().pre_forward(module, *args, **kwargs)
+
+        def post_forward(self, module, output):
+            next_hook = self.next_module_hook
+            if next_hook is not None and next_hook.hook.prefetch_event is None:
+                next_hook.hook.prefetch(next_hook.model)
+            return output
+
 
 LIBRARIES = []
 for library in LOADABLE_CLASSES:
@@ -1001,12 +1055,22 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
         r"""
         Removes all hooks that were added when using `enable_sequential_cpu_offload` or `enable_model_cpu_offload`.
         """
+        # a model prefetched by `enable_model_cpu_offload(prefetch_next_model=True)` may still be copied to the GPU,
+        # the copy has to be done before the model is moved again
+        for hook in getattr(self, "_all_hooks", []):
+            if isinstance(getattr(hook, "hook", None), _StreamPrefetchCpuOffload):
+                hook.hook.wait_for_prefetch(hook.model)
         for _, model in self.components.items():
             if isinstance(model, torch.nn.Module) and hasattr(model, "_hf_hook"):
                 accelerate.hooks.remove_hook_from_module(model, recurse=True)
         self._all_hooks = []
 
-    def enable_model_cpu_offload(self, gpu_id: Optional[int] = None, device: Union[torch.device, str] = "cuda"):
+    def enable_model_cpu_offload(
+        self,
+        gpu_id: Optional[int] = None,
+        device: Union[torch.device, str] = "cuda",
+        prefetch_next_model: bool = False,
+    ):
         r"""
         Offloads all models to CPU using accelerate, reducing memory usage with a low impact on performance. Compared
         to `enable_sequential_cpu_offload`, this method moves one whole model at a time to the GPU when its `forward`
@@ -1019,6 +1083,11 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
             device (`torch.Device` or `str`, *optional*, defaults to "cuda"):
                 The PyTorch device type of the accelerator that shall be used in inference. If not specified, it will
                 default to "cuda".
+            prefetch_next_model (`bool`, *optional*, defaults to `False`):
+                Whether to copy the next model of `model_cpu_offload_seq` to the GPU on a separate CUDA stream while
+                the current model is computing, instead of only moving it when its `forward` is called. This hides
+                most of the host-to-device transfers, at the cost of keeping two models on the GPU at the same time.
+                Only supported on CUDA devices.
         """
         is_pipeline_device_mapped = self.hf_device_map is not None and len(self.hf_device_map) > 1
         if is_pipeline_device_mapped:
@@ -1054,21 +1123,39 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
         device = torch.device(f"{device_type}:{self._offload_gpu_id}")
         self._offload_device = device
 
+        if prefetch_next_model and device.type != "cuda":
+            raise ValueError(
+                f"`prefetch_next_model=True` relies on CUDA streams and is not supported on the {device.type} device."
+            )
+        self._offload_prefetch_next_model = prefetch_next_model
+
         self.to("cpu", silence_dtype_warnings=True)
-        device_mod = getattr(torch, device.type, None)
-        if hasattr(device_mod, "empty_cache") and device_mod.is_available():
-            device_mod.empty_cache()  # otherwise we don't see the memory savings (but they probably exist)
+        # when `maybe_free_model_hooks` re-enables the offloading at the end of a pipeline call, the cached blocks are
+        # kept for the next call instead of being released to the driver and allocated again
+        if not getattr(self, "_is_reenabling_model_cpu_offload", False):
+            device_mod = getattr(torch, device.type, None)
+            if hasattr(device_mod, "empty_cache") and device_mod.is_available():
+                device_mod.empty_cache()  # otherwise we don't see the memory savings (but they probably exist)
 
         all_model_components = {k: v for k, v in self.components.items() if isinstance(v, torch.nn.Module)}
 
         self._all_hooks = []
         hook = None
+        copy_stream = torch.cuda.Stream(device) if prefetch_next_model else None
         for model_str in self.model_cpu_offload_seq.split("->"):
             model = all_model_components.pop(model_str, None)
             if not isinstance(model, torch.nn.Module):
                 continue
 
-            _, hook = cpu_offload_with_hook(model, device, prev_module_hook=hook)
+            if prefetch_next_model:
+                prev_hook = hook
+                offload_hook = _StreamPrefetchCpuOffload(device, prev_module_hook=prev_hook, copy_stream=copy_stream)
+                accelerate.hooks.add_hook_to_module(model, offload_hook)
+                hook = accelerate.hooks.UserCpuOffloadHook(model, offload_hook)
+                if prev_hook is not None:
+                    prev_hook.hook.next_module_hook = hook
+            else:
+                _, hook = cpu_offload_with_hook(model, device, prev_module_hook=hook)
             self._all_hooks.append(hook)
 
         # CPU offload models that are not in the seq chain unless they are explicitly excluded
@@ -1096,7 +1183,14 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
             return
 
         # make sure the model is in the same state as before calling it
-        self.enable_model_cpu_offload(device=getattr(self, "_offload_device", "cuda"))
+        self._is_reenabling_model_cpu_offload = True
+        try:
+            self.enable_model_cpu_offload(
+                device=getattr(self, "_offload_device", "cuda"),
+                prefetch_next_model=getattr(self, "_offload_prefetch_next_model", False),
+            )
+        finally:
+            self._is_reenabling_model_cpu_offload = False
 
     def enable_sequential_cpu_offload(self, gpu_id: Optional[int] = None, device: Union[torch.device, str] = "cuda"):
         r"""
@@ -142,10 +142,20 @@ class StableAudioProjectionModel(ModelMixin, ConfigMixin):
         text_hidden_states: Optional[torch.Tensor] = None,
         start_seconds: Optional[torch.Tensor] = None,
         end_seconds: Optional[torch.Tensor] = None,
+        attention_mask: Optional[torch.Tensor] = None,
     ):
-        text_hidden_states = (
+        projected_text_hidden_states = (
             text_hidden_states if text_hidden_states is None else self.text_projection(text_hidden_states)
         )
+        if projected_text_hidden_states is not None and attention_mask is not None:
+            # set the masked tokens to zero, in place unless the projection is the identity and returned its input
+            # comparing to zero gives the boolean padding mask directly, for integer and boolean masks alike
+            padding_mask = (attention_mask == 0).unsqueeze(-1)
+            if projected_text_hidden_states is text_hidden_states:
+                projected_text_hidden_states = projected_text_hidden_states.masked_fill(padding_mask, 0.0)
+            else:
+                projected_text_hidden_states.masked_fill_(padding_mask, 0.0)
+        text_hidden_states = projected_text_hidden_states
         seconds_start_hidden_states = (
             start_seconds if start_seconds is None else self.start_number_conditioner(start_seconds)
         )
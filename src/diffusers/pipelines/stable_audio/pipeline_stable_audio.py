@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import inspect
+import math
 from typing import Callable, List, Optional, Union
 
 import torch
@@ -71,6 +73,12 @@ EXAMPLE_DOC_STRING = """
 """
 
 
+@functools.lru_cache(maxsize=None)
+def _get_scheduler_step_parameters(scheduler_cls):
+    # `inspect.signature` is costly and the signature of `step` only depends on the scheduler class
+    return set(inspect.signature(scheduler_cls.step).parameters.keys())
+
+
 class StableAudioPipeline(DiffusionPipeline):
     r"""
     Pipeline for text-to-audio generation using StableAudio.
@@ -118,15 +126,23 @@ class StableAudioPipeline(DiffusionPipeline):
             transformer=transformer,
             scheduler=scheduler,
         )
+        # the text encoder is frozen, so it is put in eval mode once here rather than on every `encode_prompt` call.
+        # An encoder that is assigned after initialization or put back in train mode must be set to eval by the user
+        if self.text_encoder is not None:
+            self.text_encoder.eval()
         self.rotary_embed_dim = self.transformer.config.attention_head_dim // 2
+        self._rotary_embedding_cache = {}
 
-    # Copied from diffusers.pipelines.pipeline_utils.StableDiffusionMixin.enable_vae_slicing
-    def enable_vae_slicing(self):
+    def enable_vae_slicing(self, vae_slice_size: int = 1):
         r"""
         Enable sliced VAE decoding. When this option is enabled, the VAE will split the input tensor in slices to
         compute decoding in several steps. This is useful to save some memory and allow larger batch sizes.
+
+        Args:
+            vae_slice_size (`int`, *optional*, defaults to `1`):
+                The number of waveforms decoded at once. Larger slices are faster to decode but use more memory.
         """
-        self.vae.enable_slicing()
+        self.vae.enable_slicing(slice_size=vae_slice_size)
 
     # Copied from diffusers.pipelines.pipeline_utils.StableDiffusionMixin.disable_vae_slicing
     def disable_vae_slicing(self):
@@ -136,6 +152,91 @@ class StableAudioPipeline(DiffusionPipeline):
         """
         self.vae.disable_slicing()
 
+    def enable_vae_tiling(self, vae_tile_size: int = 128):
+        r"""
+        Enable tiled VAE decoding. When this option is enabled, the VAE will split the latents into tiles along the
+        time axis and decode them separately, each with the receptive field of the decoder as context on both sides.
+        The decoded waveform is the same as without tiling, but the peak memory of the decoder only depends on the tile
+        size, which allows to decode longer audio samples.
+
+        Args:
+            vae_tile_size (`int`, *optional*, defaults to `128`):
+                The number of latent frames decoded at once. Larger tiles are faster to decode but use more memory.
+        """
+        self.vae.enable_tiling(tile_size=vae_tile_size)
+
+    # Copied from diffusers.pipelines.pipeline_utils.StableDiffusionMixin.disable_vae_tiling
+    def disable_vae_tiling(self):
+        r"""
+        Disable tiled VAE decoding. If `enable_vae_tiling` was previously enabled, this method will go back to
+        computing decoding in one step.
+        """
+        self.vae.disable_tiling()
+
+    def fuse_qkv_projections(self):
+        """
+        Enables fused QKV projections in the transformer. For self-attention modules, all projection matrices (i.e.,
+        query, key, value) are fused. For cross-attention modules, key and value projection matrices are fused.
+
+        <Tip warning={true}>
+
+        This API is 🧪 experimental.
+
+        </Tip>
+        """
+        self.fusing_transformer = True
+        self.transformer.fuse_qkv_projections()
+
+    def unfuse_qkv_projections(self):
+        """Disable QKV projection fusion in the transformer if enabled.
+
+        <Tip warning={true}>
+
+        This API is 🧪 experimental.
+
+        </Tip>
+
+        """
+        if not getattr(self, "fusing_transformer", False):
+            logger.warning("The transformer was not initially fused for QKV projections. Doing nothing.")
+        else:
+            self.transformer.unfuse_qkv_projections()
+            self.fusing_transformer = False
+
+    def _get_rotary_embedding(self, seq_len, device):
+        r"""
+        Returns the `(cos, sin)` rotary positional embedding of the transformer for a sequence of length `seq_len`, on
+        `device`. It only depends on its arguments, so it is computed once and cached across calls: this also spares
+        the attention layers from copying it to the device at every denoising step.
+        """
+        key = (self.rotary_embed_dim, seq_len, torch.device(device))
+        if key not in self._rotary_embedding_cache:
+            rotary_embedding = get_1d_rotary_pos_embed(
+                self.rotary_embed_dim,
+                seq_len,
+                use_real=True,
+                repeat_interleave_real=False,
+            )
+            self._rotary_embedding_cache[key] = tuple(emb.to(device) for emb in rotary_embedding)
+        return self._rotary_embedding_cache[key]
+
+    def _decode_latents(self, latents, waveform_start, waveform_end):
+        r"""
+        Decodes the waveform samples between `waveform_start` and `waveform_end` from `latents`. Only the latents that
+        the requested waveform depends on are decoded, i.e. the latents covering it with the receptive field of the
+        decoder on each side: the decoder is made of convolutions, so the decoded waveform is the same as when
+        decoding all the latents and cropping it afterwards.
+        """
+        hop_length = self.vae.hop_length
+        receptive_field = self.vae.decoder_receptive_field
+        latent_start = max(waveform_start // hop_length - receptive_field, 0)
+        latent_end = min(math.ceil(waveform_end / hop_length) + receptive_field, latents.shape[-1])
+
+        audio = self.vae.decode(latents[:, :, latent_start:latent_end]).sample
+
+        waveform_offset = latent_start * hop_length
+        return audio[:, :, waveform_start - waveform_offset : waveform_end - waveform_offset]
+
     def encode_prompt(
         self,
         prompt,
@@ -165,29 +266,35 @@ class StableAudioPipeline(DiffusionPipeline):
             )
             text_input_ids = text_inputs.input_ids
             attention_mask = text_inputs.attention_mask
-            untruncated_ids = self.tokenizer(prompt, padding="longest", return_tensors="pt").input_ids
 
-            if untruncated_ids.shape[-1] >= text_input_ids.shape[-1] and not torch.equal(
-                text_input_ids, untruncated_ids
-            ):
-                removed_text = self.tokenizer.batch_decode(
-                    untruncated_ids[:, self.tokenizer.model_max_length - 1 : -1]
-                )
-                logger.warning(
-                    f"The following part of your input was truncated because {self.text_encoder.config.model_type} can "
-                    f"only handle sequences up to {self.tokenizer.model_max_length} tokens: {removed_text}"
+            # only prompts that fill the whole `max_length` window can have been truncated, so we only re-tokenize
+            # without truncation in that case
+            if attention_mask[:, -1].any():
+                untruncated_ids = self.tokenizer(prompt, padding="longest", return_tensors="pt").input_ids
+
+                if untruncated_ids.shape[-1] >= text_input_ids.shape[-1] and not torch.equal(
+                    text_input_ids, untruncated_ids
+                ):
+                    removed_text = self.tokenizer.batch_decode(
+                        untruncated_ids[:, self.tokenizer.model_max_length - 1 : -1]
+                    )
+                    logger.warning(
+                        f"The following part of your input was truncated because {self.text_encoder.config.model_type} can "
+                        f"only handle sequences up to {self.tokenizer.model_max_length} tokens: {removed_text}"
+                    )
+
+            # the input ids and the attention mask are both integer tensors of the same shape, so they are moved to the
+            # device in a single copy
+            text_input_ids, attention_mask = torch.stack([text_input_ids, attention_mask]).to(device).unbind(0)
+
+            # 2. Text encoder forward. If the negative prompt also has to be encoded, the forward is deferred so that
+            # both go through the text encoder in a single batched pass
+            if not (do_classifier_free_guidance and negative_prompt is not None):
+                prompt_embeds = self.text_encoder(
+                    text_input_ids,
+                    attention_mask=attention_mask,
                 )
-
-            text_input_ids = text_input_ids.to(device)
-            attention_mask = attention_mask.to(device)
-
-            # 2. Text encoder forward
-            self.text_encoder.eval()
-            prompt_embeds = self.text_encoder(
-                text_input_ids,
-                attention_mask=attention_mask,
-            )
-            prompt_embeds = prompt_embeds[0]
+                prompt_embeds = prompt_embeds[0]
 
         if do_classifier_free_guidance and negative_prompt is not None:
             uncond_tokens: List[str]
@@ -216,22 +323,25 @@ class StableAudioPipeline(DiffusionPipeline):
                 return_tensors="pt",
             )
 
-            uncond_input_ids = uncond_input.input_ids.to(device)
-            negative_attention_mask = uncond_input.attention_mask.to(device)
-
-            # 2. Text encoder forward
-            self.text_encoder.eval()
-            negative_prompt_embeds = self.text_encoder(
-                uncond_input_ids,
-                attention_mask=negative_attention_mask,
+            uncond_input_ids, negative_attention_mask = (
+                torch.stack([uncond_input.input_ids, uncond_input.attention_mask]).to(device).unbind(0)
             )
-            negative_prompt_embeds = negative_prompt_embeds[0]
 
-            if negative_attention_mask is not None:
-                # set the masked tokens to the null embed
-                negative_prompt_embeds = torch.where(
-                    negative_attention_mask.to(torch.bool).unsqueeze(2), negative_prompt_embeds, 0.0
+            # 2. Text encoder forward
+            if prompt_embeds is None:
+                text_encoder_output = self.text_encoder(
+                    torch.cat([text_input_ids, uncond_input_ids]),
+                    attention_mask=torch.cat([attention_mask, negative_attention_mask]),
+                )
+                prompt_embeds, negative_prompt_embeds = text_encoder_output[0].split(
+                    [text_input_ids.shape[0], uncond_input_ids.shape[0]]
                 )
+            else:
+                negative_prompt_embeds = self.text_encoder(
+                    uncond_input_ids,
+                    attention_mask=negative_attention_mask,
+                )
+                negative_prompt_embeds = negative_prompt_embeds[0]
 
         # 3. Project prompt_embeds and negative_prompt_embeds
         if do_classifier_free_guidance and negative_prompt_embeds is not None:
@@ -247,12 +357,15 @@ class StableAudioPipeline(DiffusionPipeline):
             if attention_mask is not None:
                 attention_mask = torch.cat([negative_attention_mask, attention_mask])
 
+        # the text encoder can run in a different precision than the rest of the pipeline, e.g. when it is loaded in
+        # 8-bit, in which case its hidden states are cast to the precision of the projection model
+        prompt_embeds = prompt_embeds.to(self.projection_model.dtype)
+
+        # the projection model sets the masked tokens to the null embed
         prompt_embeds = self.projection_model(
             text_hidden_states=prompt_embeds,
+            attention_mask=attention_mask,
         ).text_hidden_states
-        if attention_mask is not None:
-            prompt_embeds = prompt_embeds * attention_mask.unsqueeze(-1).to(prompt_embeds.dtype)
-            prompt_embeds = prompt_embeds * attention_mask.unsqueeze(-1).to(prompt_embeds.dtype)
 
         return prompt_embeds
 
@@ -261,7 +374,6 @@ class StableAudioPipeline(DiffusionPipeline):
         audio_start_in_s,
         audio_end_in_s,
         device,
-        do_classifier_free_guidance,
         batch_size,
     ):
         audio_start_in_s = audio_start_in_s if isinstance(audio_start_in_s, list) else [audio_start_in_s]
@@ -272,12 +384,12 @@ class StableAudioPipeline(DiffusionPipeline):
         if len(audio_end_in_s) == 1:
             audio_end_in_s = audio_end_in_s * batch_size
 
-        # Cast the inputs to floats
-        audio_start_in_s = [float(x) for x in audio_start_in_s]
-        audio_start_in_s = torch.tensor(audio_start_in_s).to(device)
-
-        audio_end_in_s = [float(x) for x in audio_end_in_s]
-        audio_end_in_s = torch.tensor(audio_end_in_s).to(device)
+        # Cast the inputs to floats and move them to the device in a single (2, batch_size) tensor
+        seconds = torch.tensor(
+            [[float(x) for x in audio_start_in_s], [float(x) for x in audio_end_in_s]],
+            device=device,
+        )
+        audio_start_in_s, audio_end_in_s = seconds.unbind(0)
 
         projection_output = self.projection_model(
             start_seconds=audio_start_in_s,
@@ -286,28 +398,22 @@ class StableAudioPipeline(DiffusionPipeline):
         seconds_start_hidden_states = projection_output.seconds_start_hidden_states
         seconds_end_hidden_states = projection_output.seconds_end_hidden_states
 
-        # For classifier free guidance, we need to do two forward passes.
-        # Here we repeat the audio hidden states to avoid doing two forward passes
-        if do_classifier_free_guidance:
-            seconds_start_hidden_states = torch.cat([seconds_start_hidden_states, seconds_start_hidden_states], dim=0)
-            seconds_end_hidden_states = torch.cat([seconds_end_hidden_states, seconds_end_hidden_states], dim=0)
-
         return seconds_start_hidden_states, seconds_end_hidden_states
 
-    # Copied from diffusers.pipelines.stable_diffusion.pipeline_stable_diffusion.StableDiffusionPipeline.prepare_extra_step_kwargs
     def prepare_extra_step_kwargs(self, generator, eta):
         # prepare extra kwargs for the scheduler step, since not all schedulers have the same signature
         # eta (η) is only used with the DDIMScheduler, it will be ignored for other schedulers.
         # eta corresponds to η in DDIM paper: https://arxiv.org/abs/2010.02502
         # and should be between [0, 1]
+        step_parameters = _get_scheduler_step_parameters(type(self.scheduler))
 
-        accepts_eta = "eta" in set(inspect.signature(self.scheduler.step).parameters.keys())
+        accepts_eta = "eta" in step_parameters
         extra_step_kwargs = {}
         if accepts_eta:
             extra_step_kwargs["eta"] = eta
 
         # check if the scheduler accepts generator
-        accepts_generator = "generator" in set(inspect.signature(self.scheduler.step).parameters.keys())
+        accepts_generator = "generator" in step_parameters
         if accepts_generator:
             extra_step_kwargs["generator"] = generator
         return extra_step_kwargs
@@ -325,27 +431,25 @@ class StableAudioPipeline(DiffusionPipeline):
         negative_attention_mask=None,
         initial_audio_waveforms=None,
         initial_audio_sampling_rate=None,
+        num_inference_steps=None,
+        guidance_skip_steps=None,
     ):
         if audio_end_in_s < audio_start_in_s:
             raise ValueError(
                 f"`audio_end_in_s={audio_end_in_s}' must be higher than 'audio_start_in_s={audio_start_in_s}` but "
             )
 
-        if (
-            audio_start_in_s < self.projection_model.config.min_value
-            or audio_start_in_s > self.projection_model.config.max_value
-        ):
+        min_value, max_value = self.projection_model.config.min_value, self.projection_model.config.max_value
+
+        if audio_start_in_s < min_value or audio_start_in_s > max_value:
             raise ValueError(
-                f"`audio_start_in_s` must be greater than or equal to {self.projection_model.config.min_value}, and lower than or equal to {self.projection_model.config.max_value} but "
+                f"`audio_start_in_s` must be greater than or equal to {min_value}, and lower than or equal to {max_value} but "
                 f"is {audio_start_in_s}."
             )
 
-        if (
-            audio_end_in_s < self.projection_model.config.min_value
-            or audio_end_in_s > self.projection_model.config.max_value
-        ):
+        if audio_end_in_s < min_value or audio_end_in_s > max_value:
             raise ValueError(
-                f"`audio_end_in_s` must be greater than or equal to {self.projection_model.config.min_value}, and lower than or equal to {self.projection_model.config.max_value} but "
+                f"`audio_end_in_s` must be greater than or equal to {min_value}, and lower than or equal to {max_value} but "
                 f"is {audio_end_in_s}."
             )
 
@@ -400,6 +504,14 @@ class StableAudioPipeline(DiffusionPipeline):
                 "Make sure to resample the `initial_audio_waveforms` and to correct the sampling rate. "
             )
 
+        if guidance_skip_steps is not None and any(
+            not isinstance(step, int) or step < 0 or step >= num_inference_steps for step in guidance_skip_steps
+        ):
+            raise ValueError(
+                f"`guidance_skip_steps` must only contain integers between 0 and `num_inference_steps - 1` ="
+                f" {num_inference_steps - 1} but is {guidance_skip_steps}."
+            )
+
     def prepare_latents(
         self,
         batch_size,
@@ -425,8 +537,11 @@ class StableAudioPipeline(DiffusionPipeline):
         else:
             latents = latents.to(device)
 
-        # scale the initial noise by the standard deviation required by the scheduler
-        latents = latents * self.scheduler.init_noise_sigma
+        # scale the initial noise by the standard deviation required by the scheduler, which many schedulers set to 1.0.
+        # Tensor values are always applied, since comparing them would synchronize with the device
+        init_noise_sigma = self.scheduler.init_noise_sigma
+        if not (isinstance(init_noise_sigma, (int, float)) and init_noise_sigma == 1.0):
+            latents = latents * init_noise_sigma
 
         # encode the initial audio for use by the model
         if initial_audio_waveforms is not None:
@@ -467,7 +582,8 @@ class StableAudioPipeline(DiffusionPipeline):
             audio[:, :, : min(audio_length, audio_vae_length)] = initial_audio_waveforms[:, :, :audio_vae_length]
 
             encoded_audio = self.vae.encode(audio).latent_dist.sample(generator)
-            encoded_audio = encoded_audio.repeat((num_waveforms_per_prompt, 1, 1))
+            # duplicate each initial audio for the waveforms of its prompt, matching the order of the prompt embeddings
+            encoded_audio = encoded_audio.repeat_interleave(num_waveforms_per_prompt, dim=0)
             latents = encoded_audio + latents
         return latents
 
@@ -495,6 +611,7 @@ class StableAudioPipeline(DiffusionPipeline):
         callback: Optional[Callable[[int, int, torch.Tensor], None]] = None,
         callback_steps: Optional[int] = 1,
         output_type: Optional[str] = "pt",
+        guidance_skip_steps: Optional[List[int]] = None,
     ):
         r"""
         The call function to the pipeline for generation.
@@ -559,6 +676,12 @@ class StableAudioPipeline(DiffusionPipeline):
                 The output format of the generated audio. Choose between `"np"` to return a NumPy `np.ndarray` or
                 `"pt"` to return a PyTorch `torch.Tensor` object. Set to `"latent"` to return the latent diffusion
                 model (LDM) output.
+            guidance_skip_steps (`List[int]`, *optional*):
+                The indices, between 0 and `num_inference_steps - 1`, of the denoising steps on which classifier-free
+                guidance is skipped. On these steps, only the conditional branch is computed, which halves the cost of
+                the transformer forward pass. For schedulers of order higher than 1, all the transformer evaluations of
+                a step are affected. Skipping the guidance on the last steps usually has little impact on the quality.
+                Ignored when not using guidance.
 
         Examples:
 
@@ -596,6 +719,8 @@ class StableAudioPipeline(DiffusionPipeline):
             negative_attention_mask,
             initial_audio_waveforms,
             initial_audio_sampling_rate,
+            num_inference_steps,
+            guidance_skip_steps,
         )
 
         # 2. Define call parameters
@@ -629,39 +754,48 @@ class StableAudioPipeline(DiffusionPipeline):
             audio_start_in_s,
             audio_end_in_s,
             device,
-            do_classifier_free_guidance and (negative_prompt is not None or negative_prompt_embeds is not None),
             batch_size,
         )
+        # (batch_size, 2, hidden_size), which is also viewed as the (batch_size, 1, 2 * hidden_size) global states
+        seconds_hidden_states = torch.cat([seconds_start_hidden_states, seconds_end_hidden_states], dim=1)
 
-        # Create text_audio_duration_embeds and audio_duration_embeds
-        text_audio_duration_embeds = torch.cat(
-            [prompt_embeds, seconds_start_hidden_states, seconds_end_hidden_states], dim=1
-        )
+        # For classifier free guidance, the duration conditioning is the same for the unconditional and conditional
+        # halves of the batch, so it is duplicated only once and shared by the cross-attention and global states
+        if do_classifier_free_guidance:
+            seconds_hidden_states = seconds_hidden_states.repeat(2, 1, 1)
 
-        audio_duration_embeds = torch.cat([seconds_start_hidden_states, seconds_end_hidden_states], dim=2)
+        # Create text_audio_duration_embeds and audio_duration_embeds
+        audio_duration_embeds = seconds_hidden_states.view(seconds_hidden_states.shape[0], 1, -1)
 
-        # In case of classifier free guidance without negative prompt, we need to create unconditional embeddings and
-        # to concatenate it to the embeddings
+        # In case of classifier free guidance without negative prompt, the unconditional embeddings are null
+        # embeddings: the full batch is allocated as zeros once and only the conditional half is written
         if do_classifier_free_guidance and negative_prompt_embeds is None and negative_prompt is None:
-            negative_text_audio_duration_embeds = torch.zeros_like(
-                text_audio_duration_embeds, device=text_audio_duration_embeds.device
+            bs_embed, seq_len, hidden_size = prompt_embeds.shape
+            text_audio_duration_embeds = prompt_embeds.new_zeros(
+                (2 * bs_embed, seq_len + seconds_hidden_states.shape[1], hidden_size)
+            )
+            text_audio_duration_embeds[bs_embed:, :seq_len] = prompt_embeds
+            text_audio_duration_embeds[bs_embed:, seq_len:] = seconds_hidden_states[bs_embed:]
+        else:
+            text_audio_duration_embeds = torch.cat([prompt_embeds, seconds_hidden_states], dim=1)
+
+        # duplicate audio_duration_embeds and text_audio_duration_embeds for each generation per prompt, using mps
+        # friendly method. The expanded views are only materialized when more than one waveform per prompt is requested
+        if num_waveforms_per_prompt > 1:
+            bs_embed, seq_len, hidden_size = text_audio_duration_embeds.shape
+            text_audio_duration_embeds = text_audio_duration_embeds.unsqueeze(1).expand(
+                bs_embed, num_waveforms_per_prompt, seq_len, hidden_size
             )
-            text_audio_duration_embeds = torch.cat(
-                [negative_text_audio_duration_embeds, text_audio_duration_embeds], dim=0
+            text_audio_duration_embeds = text_audio_duration_embeds.reshape(
+                bs_embed * num_waveforms_per_prompt, seq_len, hidden_size
             )
-            audio_duration_embeds = torch.cat([audio_duration_embeds, audio_duration_embeds], dim=0)
-
-        bs_embed, seq_len, hidden_size = text_audio_duration_embeds.shape
-        # duplicate audio_duration_embeds and text_audio_duration_embeds for each generation per prompt, using mps friendly method
-        text_audio_duration_embeds = text_audio_duration_embeds.repeat(1, num_waveforms_per_prompt, 1)
-        text_audio_duration_embeds = text_audio_duration_embeds.view(
-            bs_embed * num_waveforms_per_prompt, seq_len, hidden_size
-        )
 
-        audio_duration_embeds = audio_duration_embeds.repeat(1, num_waveforms_per_prompt, 1)
-        audio_duration_embeds = audio_duration_embeds.view(
-            bs_embed * num_waveforms_per_prompt, -1, audio_duration_embeds.shape[-1]
-        )
+            audio_duration_embeds = audio_duration_embeds.unsqueeze(1).expand(
+                bs_embed, num_waveforms_per_prompt, *audio_duration_embeds.shape[1:]
+            )
+            audio_duration_embeds = audio_duration_embeds.reshape(
+                bs_embed * num_waveforms_per_prompt, -1, audio_duration_embeds.shape[-1]
+            )
 
         # 4. Prepare timesteps
         self.scheduler.set_timesteps(num_inference_steps, device=device)
@@ -686,56 +820,81 @@ class StableAudioPipeline(DiffusionPipeline):
         extra_step_kwargs = self.prepare_extra_step_kwargs(generator, eta)
 
         # 7. Prepare rotary positional embedding
-        rotary_embedding = get_1d_rotary_pos_embed(
-            self.rotary_embed_dim,
-            latents.shape[2] + audio_duration_embeds.shape[1],
-            use_real=True,
-            repeat_interleave_real=False,
+        rotary_embedding = self._get_rotary_embedding(latents.shape[2] + audio_duration_embeds.shape[1], device)
+
+        # the steps without guidance only use the conditional half of the embeddings
+        guidance_skip_steps = (
+            set(guidance_skip_steps) if do_classifier_free_guidance and guidance_skip_steps else set()
         )
+        if guidance_skip_steps:
+            cond_text_audio_duration_embeds = text_audio_duration_embeds.chunk(2)[1]
+            cond_audio_duration_embeds = audio_duration_embeds.chunk(2)[1]
+
+        # the latents are duplicated for classifier free guidance into a buffer that is allocated once and reused by
+        # every step, instead of concatenating them into a new tensor at each step
+        if do_classifier_free_guidance:
+            cfg_latent_model_input = latents.new_empty((2 * latents.shape[0], *latents.shape[1:]))
+
+        # the transformer takes timesteps of shape (1,), which are all viewed from a single tensor
+        transformer_timesteps = timesteps.unsqueeze(1)
 
         # 8. Denoising loop
-        num_warmup_steps = len(timesteps) - num_inference_steps * self.scheduler.order
+        scheduler_order = getattr(self.scheduler, "order", 1)
+        num_warmup_steps = len(timesteps) - num_inference_steps * scheduler_order
         with self.progress_bar(total=num_inference_steps) as progress_bar:
             for i, t in enumerate(timesteps):
+                do_guidance_step = do_classifier_free_guidance and i // scheduler_order not in guidance_skip_steps
+
                 # expand the latents if we are doing classifier free guidance
-                latent_model_input = torch.cat([latents] * 2) if do_classifier_free_guidance else latents
+                if do_guidance_step:
+                    latent_model_input = cfg_latent_model_input
+                    latent_model_input.view(2, *latents.shape).copy_(latents)
+                else:
+                    latent_model_input = latents
                 latent_model_input = self.scheduler.scale_model_input(latent_model_input, t)
 
+                if do_classifier_free_guidance and not do_guidance_step:
+                    encoder_hidden_states = cond_text_audio_duration_embeds
+                    global_hidden_states = cond_audio_duration_embeds
+                else:
+                    encoder_hidden_states = text_audio_duration_embeds
+                    global_hidden_states = audio_duration_embeds
+
                 # predict the noise residual
                 noise_pred = self.transformer(
                     latent_model_input,
-                    t.unsqueeze(0),
-                    encoder_hidden_states=text_audio_duration_embeds,
-                    global_hidden_states=audio_duration_embeds,
+                    transformer_timesteps[i],
+                    encoder_hidden_states=encoder_hidden_states,
+                    global_hidden_states=global_hidden_states,
                     rotary_embedding=rotary_embedding,
                     return_dict=False,
                 )[0]
 
                 # perform guidance
-                if do_classifier_free_guidance:
+                if do_guidance_step:
                     noise_pred_uncond, noise_pred_text = noise_pred.chunk(2)
-                    noise_pred = noise_pred_uncond + guidance_scale * (noise_pred_text - noise_pred_uncond)
+                    # `noise_pred_uncond + guidance_scale * (noise_pred_text - noise_pred_uncond)` in a single kernel,
+                    # written in place in the unconditional half of the transformer output instead of a new tensor
+                    noise_pred = noise_pred_uncond.lerp_(noise_pred_text, guidance_scale)
 
                 # compute the previous noisy sample x_t -> x_t-1
                 latents = self.scheduler.step(noise_pred, t, latents, **extra_step_kwargs).prev_sample
 
                 # call the callback, if provided
-                if i == len(timesteps) - 1 or ((i + 1) > num_warmup_steps and (i + 1) % self.scheduler.order == 0):
+                if i == len(timesteps) - 1 or ((i + 1) > num_warmup_steps and (i + 1) % scheduler_order == 0):
                     progress_bar.update()
                     if callback is not None and i % callback_steps == 0:
-                        step_idx = i // getattr(self.scheduler, "order", 1)
+                        step_idx = i // scheduler_order
                         callback(step_idx, t, latents)
 
         # 9. Post-processing
         if not output_type == "latent":
-            audio = self.vae.decode(latents).sample
-        else:
-            return AudioPipelineOutput(audios=latents)
+            audio = self._decode_latents(latents, waveform_start, waveform_end)
 
-        audio = audio[:, :, waveform_start:waveform_end]
-
-        if output_type == "np":
-            audio = audio.cpu().float().numpy()
+            if output_type == "np":
+                audio = audio.cpu().float().numpy()
+        else:
+            audio = latents
 
         self.maybe_free_model_hooks()
 
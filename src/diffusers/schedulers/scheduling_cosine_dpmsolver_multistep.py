@@ -353,11 +353,12 @@ class CosineDPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         h = lambda_t - lambda_s
         assert noise is not None
-        x_t = (
-            (sigma_t / sigma_s * torch.exp(-h)) * sample
-            + (alpha_t * (1 - torch.exp(-2.0 * h))) * model_output
-            + sigma_t * torch.sqrt(1.0 - torch.exp(-2 * h)) * noise
-        )
+        # the sigmas are kept on the CPU, so the coefficients are computed as Python floats without any device sync
+        # and the update runs as a single multiplication followed by in-place multiply-adds. It starts from the model
+        # output, which is already promoted to the dtype of the sample
+        x_t = model_output * (alpha_t * (1 - torch.exp(-2.0 * h))).item()
+        x_t.add_(sample, alpha=(sigma_t / sigma_s * torch.exp(-h)).item())
+        x_t.add_(noise, alpha=(sigma_t * torch.sqrt(1.0 - torch.exp(-2 * h))).item())
 
         return x_t
 
@@ -398,24 +399,23 @@ class CosineDPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         h, h_0 = lambda_t - lambda_s0, lambda_s0 - lambda_s1
         r0 = h_0 / h
-        D0, D1 = m0, (1.0 / r0) * (m0 - m1)
 
         # sde-dpmsolver++
         assert noise is not None
         if self.config.solver_type == "midpoint":
-            x_t = (
-                (sigma_t / sigma_s0 * torch.exp(-h)) * sample
-                + (alpha_t * (1 - torch.exp(-2.0 * h))) * D0
-                + 0.5 * (alpha_t * (1 - torch.exp(-2.0 * h))) * D1
-                + sigma_t * torch.sqrt(1.0 - torch.exp(-2 * h)) * noise
-            )
+            d0_coeff = alpha_t * (1 - torch.exp(-2.0 * h))
+            d1_coeff = 0.5 * (alpha_t * (1 - torch.exp(-2.0 * h)))
         elif self.config.solver_type == "heun":
-            x_t = (
-                (sigma_t / sigma_s0 * torch.exp(-h)) * sample
-                + (alpha_t * (1 - torch.exp(-2.0 * h))) * D0
-                + (alpha_t * ((1.0 - torch.exp(-2.0 * h)) / (-2.0 * h) + 1.0)) * D1
-                + sigma_t * torch.sqrt(1.0 - torch.exp(-2 * h)) * noise
-            )
+            d0_coeff = alpha_t * (1 - torch.exp(-2.0 * h))
+            d1_coeff = alpha_t * ((1.0 - torch.exp(-2.0 * h)) / (-2.0 * h) + 1.0)
+
+        # D0 = m0 and D1 = (m0 - m1) / r0, so the update is expanded as a linear combination of the sample, m0, m1 and
+        # the noise, whose coefficients are computed as Python floats from the CPU sigmas
+        d1_coeff = d1_coeff / r0
+        x_t = m0 * (d0_coeff + d1_coeff).item()
+        x_t.add_(m1, alpha=-d1_coeff.item())
+        x_t.add_(sample, alpha=(sigma_t / sigma_s0 * torch.exp(-h)).item())
+        x_t.add_(noise, alpha=(sigma_t * torch.sqrt(1.0 - torch.exp(-2 * h))).item())
 
         return x_t
 
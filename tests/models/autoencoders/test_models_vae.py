@@ -528,6 +528,28 @@ class AutoencoderOobleckTests(ModelTesterMixin, UNetTesterMixin, unittest.TestCa
     def test_forward_with_norm_groups(self):
         pass
 
+    def test_tiled_decode(self):
+        # an odd upsampling ratio makes the decoder return fewer than `hop_length` samples per latent frame
+        for downsampling_ratios in [[2, 4], [1, 3]]:
+            init_dict = get_autoencoder_oobleck_config()
+            init_dict["downsampling_ratios"] = downsampling_ratios
+            torch.manual_seed(0)
+            model = self.model_class(**init_dict).to(torch_device).eval()
+
+            latents = floats_tensor((2, init_dict["decoder_input_channels"], 16)).to(torch_device)
+            with torch.no_grad():
+                expected = model.decode(latents).sample
+
+                for tile_size in [1, 3, 8]:
+                    model.enable_tiling(tile_size=tile_size)
+                    output = model.decode(latents).sample
+
+                    assert output.shape == expected.shape
+                    assert (output - expected).abs().max() < 1e-5
+
+            model.disable_tiling()
+            assert not model.use_tiling
+
 
 @slow
 class AutoencoderTinyIntegrationTests(unittest.TestCase):
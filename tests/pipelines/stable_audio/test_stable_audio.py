@@ -31,11 +31,16 @@ from diffusers import (
     StableAudioPipeline,
     StableAudioProjectionModel,
 )
-from diffusers.utils import is_xformers_available
+from diffusers.models.embeddings import get_1d_rotary_pos_embed
+from diffusers.utils import is_accelerate_available, is_accelerate_version, is_xformers_available
 from diffusers.utils.testing_utils import enable_full_determinism, nightly, require_torch_gpu, torch_device
 
 from ..pipeline_params import TEXT_TO_AUDIO_BATCH_PARAMS
-from ..test_pipelines_common import PipelineTesterMixin
+from ..test_pipelines_common import (
+    PipelineTesterMixin,
+    check_qkv_fusion_matches_attn_procs_length,
+    check_qkv_fusion_processors_exist,
+)
 
 
 enable_full_determinism()
@@ -330,6 +335,273 @@ class StableAudioPipelineFastTests(PipelineTesterMixin, unittest.TestCase):
         assert audio.ndim == 2
         assert audio.shape[1] / stable_audio_pipe.vae.sampling_rate == 1.0
 
+    def test_stable_audio_guidance_skip_steps(self):
+        device = "cpu"  # ensure determinism for the device-dependent torch.Generator
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        inputs = self.get_dummy_inputs(device)
+        inputs["guidance_scale"] = 1.0
+        output_1 = stable_audio_pipe(**inputs).audios
+
+        # skipping the guidance on every step is the same as not using guidance
+        inputs = self.get_dummy_inputs(device)
+        inputs["guidance_skip_steps"] = list(range(inputs["num_inference_steps"]))
+        output_2 = stable_audio_pipe(**inputs).audios
+
+        assert np.abs(output_2 - output_1).max() < 1e-4
+
+        # skipping the guidance on some steps only still generates audio of the expected shape
+        inputs = self.get_dummy_inputs(device)
+        inputs["num_waveforms_per_prompt"] = 2
+        inputs["guidance_skip_steps"] = [inputs["num_inference_steps"] - 1]
+        audios = stable_audio_pipe(**inputs).audios
+
+        assert audios.shape == (2, 2, 7)
+
+        # the indices must be valid denoising steps
+        for guidance_skip_steps in [[-1], [inputs["num_inference_steps"]]]:
+            inputs = self.get_dummy_inputs(device)
+            inputs["guidance_skip_steps"] = guidance_skip_steps
+            with self.assertRaises(ValueError):
+                stable_audio_pipe(**inputs)
+
+    def test_stable_audio_rotary_embedding_cache(self):
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(torch_device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        inputs = self.get_dummy_inputs(torch_device)
+        stable_audio_pipe(**inputs)
+
+        # the rotary embedding is computed for the latents and the global states token
+        seq_len = stable_audio_pipe.transformer.config.sample_size + 1
+        rotary_embedding = stable_audio_pipe._get_rotary_embedding(seq_len, torch_device)
+        expected_rotary_embedding = get_1d_rotary_pos_embed(
+            stable_audio_pipe.rotary_embed_dim, seq_len, use_real=True, repeat_interleave_real=False
+        )
+        for emb, expected_emb in zip(rotary_embedding, expected_rotary_embedding):
+            assert emb.device.type == torch.device(torch_device).type
+            assert torch.allclose(emb.cpu(), expected_emb)
+
+        # the embedding computed by the first call is reused by the next ones
+        inputs = self.get_dummy_inputs(torch_device)
+        stable_audio_pipe(**inputs)
+        assert len(stable_audio_pipe._rotary_embedding_cache) == 1
+        assert stable_audio_pipe._get_rotary_embedding(seq_len, torch_device) is rotary_embedding
+
+    def test_fused_qkv_projections(self):
+        device = "cpu"  # ensure determinism for the device-dependent torch.Generator
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        inputs = self.get_dummy_inputs(device)
+        original_audio = stable_audio_pipe(**inputs).audios
+
+        stable_audio_pipe.fuse_qkv_projections()
+        assert check_qkv_fusion_processors_exist(
+            stable_audio_pipe.transformer
+        ), "Something wrong with the fused attention processors. Expected all the attention processors to be fused."
+        assert check_qkv_fusion_matches_attn_procs_length(
+            stable_audio_pipe.transformer, stable_audio_pipe.transformer.original_attn_processors
+        ), "Something wrong with the attention processors concerning the fused QKV projections."
+
+        inputs = self.get_dummy_inputs(device)
+        audio_fused = stable_audio_pipe(**inputs).audios
+
+        stable_audio_pipe.unfuse_qkv_projections()
+        inputs = self.get_dummy_inputs(device)
+        audio_disabled = stable_audio_pipe(**inputs).audios
+
+        assert np.allclose(
+            original_audio, audio_fused, atol=1e-3, rtol=1e-3
+        ), "Fusion of QKV projections shouldn't affect the outputs."
+        assert np.allclose(
+            audio_fused, audio_disabled, atol=1e-3, rtol=1e-3
+        ), "Outputs, with QKV projection fusion enabled, shouldn't change when fused QKV projections are disabled."
+        assert np.allclose(
+            original_audio, audio_disabled, atol=1e-3, rtol=1e-3
+        ), "Original outputs should match when fused QKV projections are disabled."
+
+    def test_stable_audio_bfloat16(self):
+        device = "cpu"  # ensure determinism for the device-dependent torch.Generator
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        inputs = self.get_dummy_inputs(device)
+        inputs["output_type"] = "np"
+        output = stable_audio_pipe(**inputs).audios
+
+        # every component runs in bfloat16, while the rotary embedding and the seconds conditioning are computed in
+        # float32 and cast where needed
+        stable_audio_pipe.to(torch.bfloat16)
+        inputs = self.get_dummy_inputs(device)
+        inputs["negative_prompt"] = "this is a negative prompt"
+        inputs["output_type"] = "latent"
+        latents = stable_audio_pipe(**inputs).audios
+        assert latents.dtype == torch.bfloat16
+
+        inputs = self.get_dummy_inputs(device)
+        inputs["output_type"] = "np"
+        output_bf16 = stable_audio_pipe(**inputs).audios
+        assert output_bf16.dtype == np.float32
+        assert np.abs(output_bf16 - output).max() < 1e-1
+
+    def test_stable_audio_decode_cropped_latents(self):
+        device = "cpu"  # ensure determinism for the device-dependent torch.Generator
+        components = self.get_dummy_components()
+        # longer latents and a larger hop length, so that the latents can be cropped around the requested waveform
+        torch.manual_seed(0)
+        components["transformer"] = StableAudioDiTModel(
+            sample_size=64,
+            in_channels=3,
+            num_layers=2,
+            attention_head_dim=4,
+            num_key_value_attention_heads=2,
+            out_channels=3,
+            cross_attention_dim=4,
+            time_proj_dim=8,
+            global_states_input_dim=8,
+            cross_attention_input_dim=4,
+        )
+        torch.manual_seed(0)
+        components["vae"] = AutoencoderOobleck(
+            encoder_hidden_size=6,
+            downsampling_ratios=[2, 4],
+            decoder_channels=3,
+            decoder_input_channels=3,
+            audio_channels=2,
+            channel_multiples=[2, 4],
+            sampling_rate=8,
+        )
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        # with a sampling rate equal to the hop length, there is one latent frame per second
+        audio_start_in_s, audio_end_in_s = 24.0, 32.0
+        decoder_context = stable_audio_pipe.vae.decoder_receptive_field
+        assert audio_start_in_s - decoder_context > 0 and audio_end_in_s + decoder_context < 64
+
+        inputs = self.get_dummy_inputs(device)
+        inputs["audio_start_in_s"], inputs["audio_end_in_s"] = audio_start_in_s, audio_end_in_s
+        inputs["output_type"] = "latent"
+        latents = stable_audio_pipe(**inputs).audios
+        with torch.no_grad():
+            expected_audio = stable_audio_pipe.vae.decode(latents.clone()).sample[:, :, 24 * 8 : 32 * 8]
+
+        # only the latents around the requested waveform are decoded
+        inputs = self.get_dummy_inputs(device)
+        inputs["audio_start_in_s"], inputs["audio_end_in_s"] = audio_start_in_s, audio_end_in_s
+        audio = stable_audio_pipe(**inputs).audios
+
+        assert audio.shape == expected_audio.shape
+        assert (audio - expected_audio).abs().max() < 1e-5
+
+        # make sure tiled vae decode yields the same result, for tiles of one latent frame and uneven tiles
+        for vae_tile_size in [1, 3]:
+            stable_audio_pipe.enable_vae_tiling(vae_tile_size=vae_tile_size)
+            inputs = self.get_dummy_inputs(device)
+            inputs["audio_start_in_s"], inputs["audio_end_in_s"] = audio_start_in_s, audio_end_in_s
+            audio = stable_audio_pipe(**inputs).audios
+
+            assert audio.shape == expected_audio.shape
+            assert (audio - expected_audio).abs().max() < 1e-5
+
+        stable_audio_pipe.disable_vae_tiling()
+        assert not stable_audio_pipe.vae.use_tiling
+
+        # the dummy vae has an upsampling ratio of 1, for which the decoder returns one sample less than the number of
+        # latent frames times the hop length
+        stable_audio_pipe = StableAudioPipeline(**self.get_dummy_components())
+        stable_audio_pipe = stable_audio_pipe.to(device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        inputs = self.get_dummy_inputs(device)
+        expected_audio = stable_audio_pipe(**inputs).audios
+        assert expected_audio.shape == (1, 2, 7)
+
+        for vae_tile_size in [1, 2, 3]:
+            stable_audio_pipe.enable_vae_tiling(vae_tile_size=vae_tile_size)
+            inputs = self.get_dummy_inputs(device)
+            audio = stable_audio_pipe(**inputs).audios
+
+            assert audio.shape == expected_audio.shape
+            assert (audio - expected_audio).abs().max() < 1e-5
+
+    def test_stable_audio_output_type_latent(self):
+        device = "cpu"  # ensure determinism for the device-dependent torch.Generator
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        inputs = self.get_dummy_inputs(device)
+        inputs["output_type"] = "latent"
+        latents = stable_audio_pipe(**inputs).audios
+        assert latents.shape == (1, 3, 4)
+
+        # the latents also honor `return_dict`
+        inputs = self.get_dummy_inputs(device)
+        inputs["output_type"] = "latent"
+        inputs["return_dict"] = False
+        output = stable_audio_pipe(**inputs)
+        assert isinstance(output, tuple)
+        assert torch.equal(output[0], latents)
+
+    def test_stable_audio_grad_disabled(self):
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(torch_device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        grad_enabled = []
+        stable_audio_pipe.transformer.register_forward_pre_hook(
+            lambda module, args: grad_enabled.append(torch.is_grad_enabled())
+        )
+
+        for output_type in ["pt", "latent"]:
+            inputs = self.get_dummy_inputs(torch_device)
+            inputs["output_type"] = output_type
+            audio = stable_audio_pipe(**inputs).audios
+
+            # the returned audio is a regular tensor, that can be updated in place outside of the call
+            assert not audio.is_inference()
+            audio /= audio.abs().max()
+
+        # the denoising runs without the autograd machinery
+        assert len(grad_enabled) > 0
+        assert not any(grad_enabled)
+
+    def test_stable_audio_vae_slicing(self):
+        device = "cpu"  # ensure determinism for the device-dependent torch.Generator
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        audio_count = 4
+
+        inputs = self.get_dummy_inputs(device)
+        inputs["prompt"] = [inputs["prompt"]] * audio_count
+        output_1 = stable_audio_pipe(**inputs).audios
+
+        # make sure sliced vae decode yields the same result, for slices of one and several waveforms
+        for vae_slice_size in [1, 3]:
+            stable_audio_pipe.enable_vae_slicing(vae_slice_size=vae_slice_size)
+            inputs = self.get_dummy_inputs(device)
+            inputs["prompt"] = [inputs["prompt"]] * audio_count
+            output_2 = stable_audio_pipe(**inputs).audios
+
+            assert np.abs(output_2.flatten() - output_1.flatten()).max() < 1e-4
+
     def test_attention_slicing_forward_pass(self):
         self._test_attention_slicing_forward_pass(test_mean_pixel_difference=False)
 
@@ -402,6 +674,98 @@ class StableAudioPipelineFastTests(PipelineTesterMixin, unittest.TestCase):
 
         assert audios.shape == (batch_size * num_waveforms_per_prompt, 2, 7)
 
+    def test_stable_audio_input_waveform_num_waveforms_order(self):
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+
+        batch_size, num_waveforms_per_prompt = 2, 3
+        num_channels_vae = stable_audio_pipe.vae.config.decoder_input_channels
+        sample_size = stable_audio_pipe.transformer.config.sample_size
+        initial_audio_waveforms = torch.stack([torch.ones((2, 5)), -torch.ones((2, 5))])
+
+        # the initial audios are added to zero latents, so that the output only contains the encoded audios
+        latents = stable_audio_pipe.prepare_latents(
+            batch_size * num_waveforms_per_prompt,
+            num_channels_vae,
+            sample_size,
+            torch.float32,
+            "cpu",
+            torch.Generator("cpu").manual_seed(0),
+            latents=torch.zeros((batch_size * num_waveforms_per_prompt, num_channels_vae, sample_size)),
+            initial_audio_waveforms=initial_audio_waveforms,
+            num_waveforms_per_prompt=num_waveforms_per_prompt,
+            audio_channels=2,
+        )
+
+        # the waveforms of a prompt are contiguous in the batch, so they must all start from the audio of that prompt
+        latents = latents.view(batch_size, num_waveforms_per_prompt, num_channels_vae, sample_size)
+        for waveform_latents in latents:
+            assert torch.equal(waveform_latents, waveform_latents[:1].expand_as(waveform_latents))
+        assert not torch.equal(latents[0, 0], latents[1, 0])
+
+    @unittest.skipIf(
+        torch_device != "cuda" or not is_accelerate_available() or is_accelerate_version("<", "0.17.0"),
+        reason="CPU offload is only available with CUDA and `accelerate v0.17.0` or higher",
+    )
+    def test_model_cpu_offload_prefetch_forward_pass(self, expected_max_diff=2e-4):
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(torch_device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        inputs = self.get_dummy_inputs("cpu")
+        output_without_offload = stable_audio_pipe(**inputs).audios
+
+        stable_audio_pipe.enable_model_cpu_offload(prefetch_next_model=True)
+        inputs = self.get_dummy_inputs("cpu")
+        output_with_offload = stable_audio_pipe(**inputs).audios
+
+        max_diff = (output_with_offload - output_without_offload).abs().max()
+        assert max_diff < expected_max_diff
+
+        # the prefetched models are offloaded back to the CPU at the end of the call
+        offloaded_modules = [v for v in stable_audio_pipe.components.values() if isinstance(v, torch.nn.Module)]
+        assert all(module.device.type == "cpu" for module in offloaded_modules)
+        assert stable_audio_pipe._offload_prefetch_next_model
+
+        # enabling the offloading again without prefetching goes back to plain offloading
+        stable_audio_pipe.enable_model_cpu_offload()
+        assert not stable_audio_pipe._offload_prefetch_next_model
+        assert not any(hasattr(hook.hook, "prefetch") for hook in stable_audio_pipe._all_hooks)
+
+    @unittest.skipIf(
+        torch_device != "cuda" or not is_accelerate_available() or is_accelerate_version("<", "0.17.0"),
+        reason="CPU offload is only available with CUDA and `accelerate v0.17.0` or higher",
+    )
+    def test_model_cpu_offload_prefetch_input_waveform(self, expected_max_diff=2e-4):
+        components = self.get_dummy_components()
+        stable_audio_pipe = StableAudioPipeline(**components)
+        stable_audio_pipe = stable_audio_pipe.to(torch_device)
+        stable_audio_pipe.set_progress_bar_config(disable=None)
+
+        def get_inputs():
+            inputs = self.get_dummy_inputs("cpu")
+            inputs["initial_audio_waveforms"] = torch.ones((1, 5))
+            inputs["initial_audio_sampling_rate"] = stable_audio_pipe.vae.sampling_rate
+            return inputs
+
+        output_without_offload = stable_audio_pipe(**get_inputs()).audios
+
+        # the vae encodes the initial audio while the transformer is prefetched, so it offloads the transformer
+        # before its copy to the GPU is used
+        stable_audio_pipe.enable_model_cpu_offload(prefetch_next_model=True)
+        transformer_state_dict = {k: v.clone() for k, v in stable_audio_pipe.transformer.state_dict().items()}
+        for _ in range(2):
+            output_with_offload = stable_audio_pipe(**get_inputs()).audios
+
+            max_diff = (output_with_offload - output_without_offload).abs().max()
+            assert max_diff < expected_max_diff
+
+        # the weights offloaded back to the CPU are the ones of the finished copy
+        for name, param in stable_audio_pipe.transformer.state_dict().items():
+            assert param.device.type == "cpu"
+            assert torch.equal(param, transformer_state_dict[name])
+
     @unittest.skip("Not supported yet")
     def test_sequential_cpu_offload_forward_pass(self):
         pass